@@ -1,8 +1,8 @@
-from y_server import app
-import json
+from y_server import app, config
 
 if __name__ == "__main__":
-    config = json.load(open("config_files/exp_config.json"))
     debug = True if config["debug"] == "True" else False
 
-    app.run(debug=debug, port=int(config["port"]), host=config["host"])
+    app.run(
+        debug=debug, port=int(config["port"]), host=config["host"], threaded=True
+    )
@@ -1,29 +1,76 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-import json
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.schema import CreateIndex
 import shutil
 import os
+from y_server.settings import get_config, EXPERIMENTS_DIR, CLEAN_DB_PATH
 
 # create the experiments folder
-if not os.path.exists("./experiments"):
-    os.mkdir("./experiments")
+os.makedirs(EXPERIMENTS_DIR, exist_ok=True)
 
 # read the experiment configuration
-config = json.load(open("config_files/exp_config.json"))
+config = get_config()
+
+db_path = os.path.abspath(os.path.join(EXPERIMENTS_DIR, f"{config['name']}.db"))
+reset_db = config["reset_db"] == "True"
+
+if reset_db or not os.path.exists(db_path):
+    # drop the write-ahead log of a previous run, it does not match the new copy
+    for suffix in ("-wal", "-shm"):
+        try:
+            os.remove(f"{db_path}{suffix}")
+        except FileNotFoundError:
+            pass
 
-if (
-    not os.path.exists(f"experiments/{config['name']}.db")
-    or config["reset_db"] == "True"
-):
     # copy the clean database to the experiments folder
-    shutil.copyfile(
-        "data_schema/database_clean_server.db", f"experiments/{config['name']}.db"
-    )
+    # (shutil.copyfile already uses an in-kernel copy on Linux)
+    shutil.copyfile(CLEAN_DB_PATH, db_path)
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "4YrzfpQ4kGXjuP6w"
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///../experiments/{config['name']}.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.config["EXP_CONFIG"] = config
+# keep sqlite connections open across requests (each request runs on its own thread)
+# and wait for the sqlite lock instead of failing when requests overlap
+# pooled connections outlive the code that opened them: dispose the engine after
+# any startup query, or the reloader parent keeps the database locked
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "poolclass": QueuePool,
+    "pool_size": 5,
+    "max_overflow": 10,
+    "connect_args": {"timeout": 30, "check_same_thread": False},
+}
 db = SQLAlchemy(app)
 
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Configure each new sqlite connection.
+    WAL lets readers and a writer work concurrently, mmap avoids a read syscall per page.
+
+    :param dbapi_connection: the sqlite3 connection
+    :param connection_record: the pool connection record
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+
 from y_server.routes import *
+
+# the schema comes from the clean database: add the indexes declared on the models it lacks
+with db.engine.begin() as connection:
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+# do not keep the startup connection pooled (see SQLALCHEMY_ENGINE_OPTIONS)
+db.engine.dispose()
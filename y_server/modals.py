@@ -44,6 +44,12 @@ class Post(db.Model):
     image_id = db.Column(db.Integer(), db.ForeignKey("images.id"), default=None)
     shared_from = db.Column(db.Integer, default=-1)
 
+    __table_args__ = (
+        db.Index("ix_post_user_round", "user_id", "round"),
+        db.Index("ix_post_round_user", "round", "user_id"),
+        db.Index("ix_post_thread", "thread_id"),
+    )
+
 
 class Hashtags(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -66,6 +72,11 @@ class Post_hashtags(db.Model):
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
     hashtag_id = db.Column(db.Integer, db.ForeignKey("hashtags.id"), nullable=False)
 
+    __table_args__ = (
+        db.Index("ix_post_hashtags_post", "post_id"),
+        db.Index("ix_post_hashtags_hashtag", "hashtag_id"),
+    )
+
 
 class Mentions(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -74,6 +85,10 @@ class Mentions(db.Model):
     round = db.Column(db.Integer, nullable=False)
     answered = db.Column(db.Integer, default=0)
 
+    __table_args__ = (
+        db.Index("ix_mentions_user_round_answered", "user_id", "round", "answered"),
+    )
+
 
 class Reactions(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -82,6 +97,8 @@ class Reactions(db.Model):
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
     type = db.Column(db.String(10), nullable=False)
 
+    __table_args__ = (db.Index("post_liker", "post_id", "user_id", unique=True),)
+
 
 class Follow(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -90,6 +107,8 @@ class Follow(db.Model):
     round = db.Column(db.Integer, nullable=False)
     action = db.Column(db.String(10), nullable=False)
 
+    __table_args__ = (db.Index("ix_follow_user_follower", "user_id", "follower_id"),)
+
 
 class Rounds(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -144,12 +163,16 @@ class User_interest(db.Model):
     interest_id = db.Column(db.Integer, db.ForeignKey("interests.iid"), nullable=False)
     round_id = db.Column(db.Integer, db.ForeignKey("rounds.id"), nullable=False)
 
+    __table_args__ = (db.Index("ix_user_interest_user_round", "user_id", "round_id"),)
+
 
 class Post_topics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
     topic_id = db.Column(db.Integer, db.ForeignKey("interests.iid"), nullable=False)
 
+    __table_args__ = (db.Index("ix_post_topics_post", "post_id"),)
+
 
 class Images(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -3,13 +3,14 @@ from .user_managment import *
 from .content_management import *
 from .interaction_management import *
 from .experiment_management import *
-
-config = json.load(open("config_files/exp_config.json"))
+from y_server import app
 
 import importlib
 
-for module in config["modules"]:
+for module in app.config["EXP_CONFIG"]["modules"]:
     try:
         importlib.import_module(f".{module}_management", "y_server.routes")
-    except:
-        raise Exception(f"Module {module} does not exists")
+    except ImportError as e:
+        raise ImportError(
+            f"Module {module} does not exist or failed to import: {e}"
+        ) from e
@@ -1,4 +1,5 @@
 import json
+import random
 from flask import request
 from y_server import app, db
 from sqlalchemy import desc
@@ -50,14 +51,16 @@ def read():
         # get posts in reverse chronological order
         if articles:
             posts = [
-                db.session.query(Post)
-                .filter(Post.round >= visibility, Post.news_id != -1, Post.user_id != uid)
+                db.session.query(Post.id)
+                .filter(
+                    Post.round >= visibility, Post.news_id != -1, Post.user_id != uid
+                )
                 .order_by(desc(Post.id))
                 .limit(10)
             ]
         else:
             posts = [
-                db.session.query(Post)
+                db.session.query(Post.id)
                 .filter(Post.round >= visibility, Post.user_id != uid)
                 .order_by(desc(Post.id))
                 .limit(10)
@@ -68,25 +71,29 @@ def read():
         if articles:
             posts = [
                 (
-                    db.session.query(Post, func.count(Reactions.user_id).label("total"))
+                    db.session.query(Post.id)
                     .filter(
                         Post.round >= visibility,
                         Post.news_id != -1,
                         Post.user_id != uid,
                     )
                     .join(Reactions)
-                    .group_by(Post)
-                    .order_by(desc("total"), desc(Post.id))
+                    .group_by(Post.id)
+                    .order_by(
+                        desc(func.count(Reactions.user_id)), desc(Post.id)
+                    )
                 ).limit(limit)
             ]
         else:
             posts = [
                 (
-                    db.session.query(Post, func.count(Reactions.user_id).label("total"))
+                    db.session.query(Post.id)
                     .filter(Post.round >= visibility, Post.user_id != uid)
                     .join(Reactions)
-                    .group_by(Post)
-                    .order_by(desc("total"), desc(Post.id))
+                    .group_by(Post.id)
+                    .order_by(
+                        desc(func.count(Reactions.user_id)), desc(Post.id)
+                    )
                 ).limit(limit)
             ]
 
@@ -102,10 +109,15 @@ def read():
         follower = Follow.query.filter_by(action="follow", user_id=uid)
         follower_ids = [f.follower_id for f in follower if f.follower_id != uid]
 
+        # no followers: fill the whole timeline with the other posts
+        if len(follower_ids) == 0:
+            follower_posts_limit, additional_posts_limit = 0, limit
+
         # get posts from followers in reverse chronological order
         if articles:
             posts = (
-                Post.query.filter(
+                db.session.query(Post.id)
+                .filter(
                     Post.round >= visibility,
                     Post.news_id != -1,
                     Post.user_id != uid,
@@ -116,17 +128,21 @@ def read():
             )
         else:
             posts = (
-                Post.query.filter(
+                db.session.query(Post.id)
+                .filter(
                     Post.round >= visibility, Post.user_id.in_(follower_ids)
                 )
                 .order_by(desc(Post.id))
                 .limit(follower_posts_limit)
             )
 
+        posts = [posts] if follower_posts_limit > 0 else []
+
         if additional_posts_limit != 0:
             if articles:
                 additional_posts = (
-                    Post.query.filter(
+                    db.session.query(Post.id)
+                    .filter(
                         Post.round >= visibility,
                         Post.news_id != -1,
                         Post.user_id != uid,
@@ -136,12 +152,13 @@ def read():
                 )
             else:
                 additional_posts = (
-                    Post.query.filter(Post.round >= visibility, Post.user_id != uid)
+                    db.session.query(Post.id)
+                    .filter(Post.round >= visibility, Post.user_id != uid)
                     .order_by(desc(Post.id))
                     .limit(additional_posts_limit)
                 )
 
-            posts = [posts, additional_posts]
+            posts.append(additional_posts)
 
     elif mode == "rchrono_followers_popularity":
         if fratio < 1:
@@ -155,52 +172,69 @@ def read():
         follower = Follow.query.filter_by(action="follow", user_id=uid)
         follower_ids = [f.follower_id for f in follower if f.follower_id != uid]
 
+        # no followers: fill the whole timeline with the other posts
+        if len(follower_ids) == 0:
+            follower_posts_limit, additional_posts_limit = 0, limit
+
         # get posts from followers ordered by likes and reverse chronologically
         if articles:
             posts = (
-                db.session.query(Post, func.count(Reactions.user_id).label("total"))
+                db.session.query(Post.id)
                 .join(Reactions)
                 .filter(
                     Post.round >= visibility,
                     Post.news_id != -1,
                     Post.user_id.in_(follower_ids),
                 )
-                .group_by(Post)
-                .order_by(desc("total"), desc(Post.id))
+                .group_by(Post.id)
+                .order_by(desc(func.count(Reactions.user_id)), desc(Post.id))
                 .limit(follower_posts_limit)
             )
         else:
             posts = (
-                db.session.query(Post, func.count(Reactions.user_id).label("total"))
+                db.session.query(Post.id)
                 .join(Reactions)
                 .filter(Post.round >= visibility, Post.user_id.in_(follower_ids))
-                .group_by(Post)
-                .order_by(desc("total"), desc(Post.id))
+                .group_by(Post.id)
+                .order_by(desc(func.count(Reactions.user_id)), desc(Post.id))
                 .limit(follower_posts_limit)
             )
 
+        posts = [posts] if follower_posts_limit > 0 else []
+
         if additional_posts_limit != 0:
             if articles:
                 additional_posts = (
-                    Post.query.filter(Post.round >= visibility, Post.news_id != -1, Post.user_id != uid)
+                    db.session.query(Post.id)
+                    .filter(
+                        Post.round >= visibility,
+                        Post.news_id != -1,
+                        Post.user_id != uid,
+                    )
                     .order_by(desc(Post.id))
                     .limit(additional_posts_limit)
                 )
             else:
                 additional_posts = (
-                    Post.query.filter(Post.round >= visibility, Post.user_id != uid)
+                    db.session.query(Post.id)
+                    .filter(Post.round >= visibility, Post.user_id != uid)
                     .order_by(desc(Post.id))
                     .limit(additional_posts_limit)
                 )
 
-            posts = [posts, additional_posts]
+            posts.append(additional_posts)
 
     else:
         # get posts in random order
         if articles:
             posts = [
                 (
-                    Post.query.filter(Post.round >= visibility, Post.news_id != -1, Post.user_id != uid)
+                    db.session.query(Post.id)
+                    .filter(
+                        Post.round >= visibility,
+                        Post.news_id != -1,
+                        Post.user_id != uid,
+                    )
                     .order_by(func.random())
                     .limit(limit)
                 )
@@ -208,22 +242,16 @@ def read():
         else:
             posts = [
                 (
-                    Post.query.filter(Post.round >= visibility, Post.user_id != uid)
+                    db.session.query(Post.id)
+                    .filter(Post.round >= visibility, Post.user_id != uid)
                     .order_by(func.random())
                     .limit(limit)
                 )
             ]
 
-    res = []
-    for post_type in posts:
-        for post in post_type:
-            try:
-                res.append(post[0].id)
-            except:
-                res.append(post.id)
+    res = [post_id for post_type in posts for (post_id,) in post_type]
 
     # save recommendations
-    current_round = Rounds.query.order_by(desc(Rounds.id)).first()
     recs = Recommendations(
         user_id=uid, post_ids="|".join([str(x) for x in res]), round=current_round.id
     )
@@ -247,41 +275,33 @@ def search():
     current_round = Rounds.query.order_by(desc(Rounds.id)).first()
     visibility = current_round.id - vround
 
-    recent_user_hashtags = Hashtags.query.filter(
-        Hashtags.id
-        == db.session.query(Post_hashtags.hashtag_id).filter(
-            Post_hashtags.post_id
-            == db.session.query(Post.id).filter(
-                Post.user_id == uid, Post.round >= visibility
-            )
-        )
-    ).limit(10)
-
-    if recent_user_hashtags is not None:
-        hashtag_ids = []
-        for hashtag in recent_user_hashtags:
-            hashtag_ids.append(hashtag.id)
-
-        hashtag_ids = list(set(hashtag_ids))
+    # hashtags recently used by the user
+    recent_user_hashtags = (
+        db.session.query(Post_hashtags.hashtag_id)
+        .join(Post, Post.id == Post_hashtags.post_id)
+        .filter(Post.user_id == uid, Post.round >= visibility)
+        .distinct()
+        .limit(10)
+    )
+    hashtag_ids = [hashtag_id for (hashtag_id,) in recent_user_hashtags]
 
+    res = []
+    if len(hashtag_ids) > 0:
+        # recent posts of other users sharing those hashtags
         recent_posts_with_hashtags = (
-            Post_hashtags.query.filter(Post_hashtags.hashtag_id.in_(hashtag_ids))
+            db.session.query(Post_hashtags.post_id)
+            .join(Post, Post.id == Post_hashtags.post_id)
             .filter(
-                Post.id == Post_hashtags.post_id,
+                Post_hashtags.hashtag_id.in_(hashtag_ids),
                 Post.user_id != uid,
                 Post.round >= visibility,
             )
             .order_by(func.random())
             .limit(10)
         )
+        res = [post_id for (post_id,) in recent_posts_with_hashtags]
 
-        res = []
-        for post in recent_posts_with_hashtags:
-            res.append(post.post_id)
-
-        return json.dumps(res)
-
-    json.dumps({"status": 404})
+    return json.dumps(res)
 
 
 @app.route("/read_mentions", methods=["POST"])
@@ -299,23 +319,40 @@ def read_mention():
     current_round = Rounds.query.order_by(desc(Rounds.id)).first()
     visibility = current_round.id - vround
 
-    mention = (
-        Mentions.query.filter(
-            Mentions.user_id == uid,
-            Mentions.round >= visibility,
-            Mentions.answered == 0,
-        )
-        .order_by(func.random())
-        .first()
+    unanswered = (
+        Mentions.user_id == uid,
+        Mentions.round >= visibility,
+        Mentions.answered == 0,
     )
 
+    # pick a random unanswered mention without sorting all of them
+    min_id, max_id = (
+        db.session.query(func.min(Mentions.id), func.max(Mentions.id))
+        .filter(*unanswered)
+        .one()
+    )
+
+    mention = None
+    if min_id is not None:
+        pivot = random.randint(min_id, max_id)
+        mention = (
+            db.session.query(Mentions.id, Mentions.post_id)
+            .filter(*unanswered, Mentions.id >= pivot)
+            .order_by(Mentions.id)
+            .first()
+        )
+
     if mention is not None:
-        mention.answered = 1
+        # mark it as answered, unless a concurrent request already did
+        answered = Mentions.query.filter_by(id=mention.id, answered=0).update(
+            {"answered": 1}, synchronize_session=False
+        )
         db.session.commit()
-        return json.dumps([mention.post_id])
 
-    else:
-        return json.dumps({"status": 404})
+        if answered > 0:
+            return json.dumps([mention.post_id])
+
+    return json.dumps({"status": 404})
 
 
 @app.route("/post", methods=["POST"])
@@ -346,58 +383,52 @@ def add_post():
     )
 
     db.session.add(post)
-    db.session.commit()
+    # flush to get the post id, everything is committed at once at the end
+    db.session.flush()
 
     post.thread_id = post.id
-    db.session.commit()
 
-    for topic_id in topics:
-        tp = Post_topics(post_id=post.id, topic_id=topic_id)
-        db.session.add(tp)
-        db.session.commit()
+    db.session.bulk_insert_mappings(
+        Post_topics,
+        [{"post_id": post.id, "topic_id": topic_id} for topic_id in topics],
+    )
+
+    hastags = [tag for tag in hastags if len(tag) >= 4]
+    emotion_ids, hashtag_ids, mentioned_users = __resolve_annotations(
+        emotions, hastags, mentions
+    )
 
     for emotion in emotions:
         if len(emotion) < 1:
             continue
 
-        em = Emotions.query.filter_by(emotion=emotion).first()
-        if em is not None:
-            post_emotion = Post_emotions(post_id=post.id, emotion_id=em.id)
+        if emotion in emotion_ids:
+            post_emotion = Post_emotions(
+                post_id=post.id, emotion_id=emotion_ids[emotion]
+            )
             db.session.add(post_emotion)
-            db.session.commit()
 
     for tag in hastags:
-        if len(tag) < 4:
-            continue
-
-        ht = Hashtags.query.filter_by(hashtag=tag).first()
-        if ht is None:
-            ht = Hashtags(hashtag=tag)
-            db.session.add(ht)
-            db.session.commit()
-            ht = Hashtags.query.filter_by(hashtag=tag).first()
-
-        post_tag = Post_hashtags(post_id=post.id, hashtag_id=ht.id)
+        post_tag = Post_hashtags(post_id=post.id, hashtag_id=hashtag_ids[tag])
         db.session.add(post_tag)
-        db.session.commit()
 
     for mention in mentions:
         if len(mention) < 1:
             continue
 
-        us = User_mgmt.query.filter_by(username=mention.strip("@")).first()
+        us = mentioned_users.get(mention.strip("@"))
 
         # existing user and not self
         if us is not None and us.id != user.id:
             mn = Mentions(user_id=us.id, post_id=post.id, round=tid)
             db.session.add(mn)
-            db.session.commit()
         else:
             text = text.replace(mention, "")
 
             # update post
             post.tweet = text.lstrip().rstrip()
-            db.session.commit()
+
+    db.session.commit()
 
     return json.dumps({"status": 200})
 
@@ -435,54 +466,48 @@ def add_comment():
     )
 
     db.session.add(post)
-    db.session.commit()
+    # flush to get the post id, everything is committed at once at the end
+    db.session.flush()
+
+    hastags = [tag for tag in hastags if len(tag) >= 1]
+    emotion_ids, hashtag_ids, mentioned_users = __resolve_annotations(
+        emotions, hastags, mentions
+    )
 
     for emotion in emotions:
         if len(emotion) < 1:
             continue
 
-        em = Emotions.query.filter_by(emotion=emotion).first()
-        if em is not None:
-            post_emotion = Post_emotions(post_id=post.id, emotion_id=em.id)
+        if emotion in emotion_ids:
+            post_emotion = Post_emotions(
+                post_id=post.id, emotion_id=emotion_ids[emotion]
+            )
             db.session.add(post_emotion)
-            db.session.commit()
 
     for tag in hastags:
-        if len(tag) < 1:
-            continue
-
-        ht = Hashtags.query.filter_by(hashtag=tag).first()
-        if ht is None:
-            ht = Hashtags(hashtag=tag)
-            db.session.add(ht)
-            db.session.commit()
-            ht = Hashtags.query.filter_by(hashtag=tag).first()
-
-        post_tag = Post_hashtags(post_id=post.id, hashtag_id=ht.id)
+        post_tag = Post_hashtags(post_id=post.id, hashtag_id=hashtag_ids[tag])
         db.session.add(post_tag)
-        db.session.commit()
 
     for mention in mentions:
         if len(mention) < 1:
             continue
 
-        us = User_mgmt.query.filter_by(username=mention.strip("@")).first()
+        us = mentioned_users.get(mention.strip("@"))
         if us is not None:
             mn = Mentions(user_id=us.id, post_id=post.id, round=tid)
             db.session.add(mn)
-            db.session.commit()
         else:
             text = text.replace(mention, "")
 
             # update post
             post.tweet = text.lstrip().rstrip()
 
-            # more than one word
-            if len(post.tweet.split(" ")) > 1:
-                db.session.commit()
-            else:
-                db.session.delete(post)
-                db.session.commit()
+            # at most one word left: drop the comment and its annotations
+            if len(post.tweet.split(" ")) <= 1:
+                db.session.rollback()
+                return json.dumps({"status": 200})
+
+    db.session.commit()
 
     return json.dumps({"status": 200})
 
@@ -501,15 +526,14 @@ def post_thread():
     post_id = data["post_id"]
 
     post = Post.query.filter_by(id=post_id).first()
-    thread_id = Post.query.filter_by(thread_id=post.thread_id)
-
-    res = []
+    thread = (
+        db.session.query(User_mgmt.username, Post.tweet)
+        .join(Post, Post.user_id == User_mgmt.id)
+        .filter(Post.thread_id == post.thread_id)
+        .order_by(Post.id)
+    )
 
-    for post in thread_id:
-        user = post.user_id
-        res.append(
-            f"@{User_mgmt.query.filter_by(id=user).first().username} - {post.tweet}\n"
-        )
+    res = [f"@{username} - {tweet}\n" for username, tweet in thread]
     return json.dumps(res)
 
 
@@ -526,9 +550,9 @@ def get_post():
     data = json.loads(request.get_data())
     post_id = data["post_id"]
 
-    post = Post.query.filter_by(id=post_id).first()
+    tweet = db.session.query(Post.tweet).filter(Post.id == post_id).scalar()
 
-    return json.dumps(post.tweet)
+    return json.dumps(tweet)
 
 
 @app.route(
@@ -570,13 +594,11 @@ def get_post_topics():
     data = json.loads(request.get_data())
     post_id = data["post_id"]
 
-    post_topics = Post_topics.query.filter_by(post_id=post_id)
+    post_topics = db.session.query(Post_topics.topic_id).filter(
+        Post_topics.post_id == post_id
+    )
 
-    res = []
-    for topic in post_topics:
-        res.append(topic.topic_id)
-
-    return json.dumps(res)
+    return json.dumps([topic_id for (topic_id,) in post_topics])
 
 
 @app.route("/get_thread_root", methods=["GET"])
@@ -589,6 +611,44 @@ def get_thread_root():
     data = json.loads(request.get_data())
     post_id = data["post_id"]
 
-    post = Post.query.filter_by(id=post_id).first()
+    thread_id = db.session.query(Post.thread_id).filter(Post.id == post_id).scalar()
 
-    return json.dumps(post.thread_id)
+    return json.dumps(thread_id)
+
+
+def __resolve_annotations(emotions, hashtags, mentions):
+    """
+    Resolve the emotions, hashtags and mentioned users of a post with one query each.
+    Hashtags not yet in the database are created.
+
+    :param emotions: the list of emotion names
+    :param hashtags: the list of hashtags
+    :param mentions: the list of mentions (usernames prefixed by @)
+    :return: the emotion ids by name, the hashtag ids by hashtag and the mentioned users by username
+    """
+    emotion_ids = {
+        em.emotion: em.id
+        for em in Emotions.query.filter(Emotions.emotion.in_(emotions))
+    }
+
+    hashtag_ids = {
+        ht.hashtag: ht.id
+        for ht in Hashtags.query.filter(Hashtags.hashtag.in_(hashtags))
+    }
+    new_hashtags = [
+        Hashtags(hashtag=tag)
+        for tag in dict.fromkeys(hashtags)
+        if tag not in hashtag_ids
+    ]
+    if len(new_hashtags) > 0:
+        db.session.add_all(new_hashtags)
+        db.session.flush()
+        hashtag_ids.update({ht.hashtag: ht.id for ht in new_hashtags})
+
+    usernames = [mention.strip("@") for mention in mentions]
+    mentioned_users = {
+        us.username: us
+        for us in User_mgmt.query.filter(User_mgmt.username.in_(usernames))
+    }
+
+    return emotion_ids, hashtag_ids, mentioned_users
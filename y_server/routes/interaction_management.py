@@ -2,7 +2,6 @@ from flask import request
 from sqlalchemy.sql.expression import func
 import json
 from y_server import app, db
-import numpy as np
 from y_server.modals import (
     User_mgmt,
     Follow,
@@ -150,6 +149,9 @@ def get_follow_suggestions():
         res = {k: v / total for k, v in res.items() if v > 0}
 
     elif rectype == "adamic_adar":
+        # numpy is only needed here: import it on first use
+        import numpy as np
+
         first_order_followers, candidates = __get_two_hops_neighbors(user_id)
 
         res = {}
@@ -198,10 +200,11 @@ def __get_two_hops_neighbors(node_id):
         Follow.user_id.in_(first_order_followers), Follow.action == "follow"
     )
     # (second_order_followers, third_order_followers)
+    # stream the (potentially large) third hop instead of loading it at once
     third_order_followers = Follow.query.filter(
         Follow.user_id.in_([f.follower_id for f in second_order_followers]),
         Follow.action == "follow",
-    )
+    ).yield_per(1000)
 
     candidate_to_follower = {}
     for node in third_order_followers:
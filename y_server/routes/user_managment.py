@@ -201,9 +201,9 @@ def get_user_from_post():
     """
     data = json.loads(request.get_data())
     post_id = data["post_id"]
-    post = Post.query.filter_by(id=post_id).first()
+    user_id = db.session.query(Post.user_id).filter(Post.id == post_id).scalar()
 
-    return json.dumps(post.user_id)
+    return json.dumps(user_id)
 
 
 @app.route("/timeline", methods=["GET"])
@@ -0,0 +1,35 @@
+import functools
+import json
+import os
+import types
+
+DEFAULT_CONFIG_PATH = os.path.join("config_files", "exp_config.json")
+DEFAULT_CONFIG = {"host": "0.0.0.0", "port": 5010}
+EXPERIMENTS_DIR = "experiments"
+CLEAN_DB_PATH = os.path.join("data_schema", "database_clean_server.db")
+
+
+@functools.lru_cache(maxsize=1)
+def _read_config(path, mtime_ns):
+    """
+    Parse the experiment configuration file.
+
+    :param path: the configuration file path
+    :param mtime_ns: the file modification time, used as cache key
+    :return: a read-only view of the parsed configuration, completed with the defaults
+    """
+    with open(path) as f:
+        return types.MappingProxyType({**DEFAULT_CONFIG, **json.load(f)})
+
+
+def get_config(path=None):
+    """
+    Load the experiment configuration.
+    The file is parsed only once, unless it changes on disk.
+
+    :param path: the configuration file path, defaults to the YSERVER_CONFIG environment variable or config_files/exp_config.json
+    :return: the parsed configuration
+    """
+    if path is None:
+        path = os.environ.get("YSERVER_CONFIG", DEFAULT_CONFIG_PATH)
+    return _read_config(path, os.stat(path).st_mtime_ns)